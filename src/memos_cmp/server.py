@@ -9,18 +9,26 @@ Memos MCP服务器
 - 包含用于日常操作改进的提示
 """
 
+from __future__ import annotations
+
+import io
 import os
-import json
-import requests
-from typing import List, Dict, Any, Optional, Union
-from datetime import datetime
+import re
+import asyncio
+import functools
+import textwrap
+import threading
+from concurrent.futures import Future
+import anyio
+import httpx
+import orjson
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Dict, Any, Optional
 import logging
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
-from mcp.server.fastmcp import FastMCP, Context
+from mcp.server.fastmcp import FastMCP
 
-# 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # 加载环境变量
@@ -35,126 +43,328 @@ MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
 MCP_HOST = os.getenv("MCP_HOST", "0.0.0.0")
 MCP_PORT = int(os.getenv("MCP_PORT", "3002"))
 MCP_STREAMABLE_HTTP_PATH = os.getenv("MCP_STREAMABLE_HTTP_PATH", "/mcp")
+MEMOS_CONNECT_TIMEOUT = float(os.getenv("MEMOS_CONNECT_TIMEOUT", "3.05"))  # 连接超时（秒）
+MEMOS_READ_TIMEOUT = float(os.getenv("MEMOS_READ_TIMEOUT", "30"))  # 读取超时（秒）
 
-if not MEMOS_URL or not MEMOS_API_KEY:
-    logger.error("请在.env文件中设置MEMOS_URL和MEMOS_API_KEY")
-    print("错误: 请在.env文件中设置MEMOS_URL和MEMOS_API_KEY")
-    print("您可以复制.env.example文件为.env并填写相应的值")
-    exit(1)
+def _require_config() -> None:
+    """检查必需的Memos配置，缺失时退出进程"""
+    if not MEMOS_URL or not MEMOS_API_KEY:
+        logger.error("请在.env文件中设置MEMOS_URL和MEMOS_API_KEY")
+        print("错误: 请在.env文件中设置MEMOS_URL和MEMOS_API_KEY")
+        print("您可以复制.env.example文件为.env并填写相应的值")
+        raise SystemExit(1)
 
 # 创建MCP服务器
 mcp = FastMCP(
     "Memos助手",
     instructions="连接到Memos API并提供搜索、管理和改进功能的MCP服务器",
-    dependencies=["python-dotenv", "requests"],
+    dependencies=["python-dotenv", "httpx[http2,brotli,zstd]", "cachetools", "orjson"],
     host=MCP_HOST,
     port=MCP_PORT,
     streamable_http_path=MCP_STREAMABLE_HTTP_PATH,
     stateless_http=True,
 )
 
+# 携带JSON请求体的HTTP方法
+_WRITE_METHODS = frozenset(("POST", "PATCH", "PUT"))
+
+# 批量操作的最大并发数，小于连接池上限以便复用已有连接
+_BULK_CONCURRENCY = 8
+
+# 备忘录资源名前缀与标签匹配规则，在导入时编译一次
+_MEMO_PREFIX = "memos/"
+_MEMO_PREFIX_LEN = len(_MEMO_PREFIX)
+# 标签结束符：空白、结尾或句读标点；/、-、+ 仍属于标签本身（如 #work/project、#c++）
+_TAG_TERMINATORS = r"\s.,;:!?)\]}\"'，。；：！？、）】"
+_TAG_END = r"(?=[" + _TAG_TERMINATORS + r"]|$)"
+# 识别已有标签时与删除使用同一组结束符，二者对“标签”的理解保持一致
+_TAG_RE = re.compile(r"#[^#" + _TAG_TERMINATORS + r"]+")
+
+
+# CEL单引号字面量的转义表：反斜杠、单引号及所有控制字符
+_CEL_ESCAPES = {
+    **{c: f"\\x{c:02x}" for c in (*range(0x20), 0x7F)},
+    ord("\\"): "\\\\",
+    ord("'"): "\\'",
+    ord("\n"): "\\n",
+    ord("\r"): "\\r",
+    ord("\t"): "\\t",
+}
+
+
+def _cel_str(s: str) -> str:
+    """转义字符串以放入CEL单引号字面量中"""
+    return s.translate(_CEL_ESCAPES)
+
+
+@functools.lru_cache(maxsize=128)
+def _tag_pattern(tags: tuple) -> re.Pattern:
+    """编译删除标签用的正则：标签后须为结束符，以免误删 #tagline、#work/project，并去掉标签后同一行的空白"""
+    return re.compile(r"#(?:" + "|".join(re.escape(tag.lstrip("#")) for tag in tags) + r")" + _TAG_END + r"[ \t]*")
+
+
+def _normalize_tags(tags: List[str]) -> List[str]:
+    """去掉标签前的#并丢弃空标签；空标签会匹配到Markdown标题的#"""
+    return [name for name in (tag.lstrip("#") for tag in tags) if name]
+
+
+class MemosException(Exception):
+    """Memos API调用异常"""
+
+
 # Memos API客户端类
 class MemosClient:
-    def __init__(self, base_url: str, api_key: str, admin_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        admin_api_key: Optional[str] = None,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30.0,
+    ):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
-        self.headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        self.admin_headers = {
-            "Authorization": f"Bearer {admin_api_key}" if admin_api_key else None,
-            "Content-Type": "application/json"
+        self.admin_api_key = admin_api_key
+        # 所有请求共用的头部；Content-Type 只在有请求体的写操作中附加
+        # Accept-Encoding交给httpx按已安装的解码器（brotli/zstd）自动生成
+        self._base_headers = {"Authorization": f"Bearer {api_key}"}
+        self._json_headers = {
+            **self._base_headers,
+            "Content-Type": "application/json",
+            "Accept": "application/json",
         }
+        self.admin_headers = {}
+        if admin_api_key:
+            self.admin_headers["Authorization"] = f"Bearer {admin_api_key}"
+        # 复用同一个HTTP/2客户端，多个请求在同一连接上多路复用
+        # 显式设置超时，避免上游无响应时工具调用一直挂起
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers=self._base_headers,
+            timeout=self.timeout,
+            transport=httpx.HTTPTransport(http2=True, limits=self._limits, retries=3),
+        )
+        # 用户ID对同一个API Key不会变化，首次查询后缓存
+        self._user_id: Optional[str] = None
+        # 异步客户端在首次使用时创建，供async工具使用
+        self._aclient: Optional[httpx.AsyncClient] = None
+        # 只读GET请求的TTL缓存，任何写操作后整体失效
+        self._get_cache = TTLCache(maxsize=256, ttl=30)
+        # TTL过期后仍短暂保留 (etag, 数据, last_modified)，用于条件请求重新校验；
+        # 数据与TTL缓存共享同一对象，并按条数和时间双重限制，避免长期占用内存
+        self._validators = TTLCache(maxsize=64, ttl=300)
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        # 正在进行中的GET请求，键与TTL缓存一致
+        self._inflight: Dict[tuple, Future] = {}
+        self._ainflight: Dict[tuple, asyncio.Task] = {}
+        self.cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "revalidated": 0}
     
     def _make_request(self, method: str, endpoint: str, params: Dict = None, data: Dict = None) -> Dict:
         """发送请求到Memos API"""
-        url = f"{self.base_url}{endpoint}"
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                params=params,
-                json=data
+            response = self.client.request(
+                method, endpoint, headers=self._headers_for(method), params=params, json=data
             )
             response.raise_for_status()
-            if response.content:
-                return response.json()
-            return {}
-        except requests.RequestException as e:
-            logger.error(f"API请求失败: {e}")
+            return orjson.loads(response.content) if response.content else {}
+        except httpx.HTTPError as e:
+            logger.error("API请求失败: %s", e)
             raise Exception(f"API请求失败: {e}")
         
+    def _headers_for(self, method: str) -> Optional[Dict]:
+        """写操作附加JSON头部，其余请求只使用客户端默认头部"""
+        return self._json_headers if method in _WRITE_METHODS else None
+
+    @staticmethod
+    def _cache_key(endpoint: str, params: Dict = None) -> tuple:
+        return (endpoint, tuple(sorted((params or {}).items())))
+
+    def _cached_get(self, endpoint: str, params: Dict = None) -> Dict:
+        """发送带TTL缓存的GET请求，并合并并发的相同请求"""
+        key = self._cache_key(endpoint, params)
+        with self._cache_lock:
+            try:
+                result = self._get_cache[key]
+            except KeyError:
+                pending = self._inflight.get(key)
+                if pending is None:
+                    self.cache_stats["misses"] += 1
+                    generation = self._cache_generation
+                    validator = self._validators.get(key)
+                    future = self._inflight[key] = Future()
+                else:
+                    self.cache_stats["coalesced"] += 1
+            else:
+                self.cache_stats["hits"] += 1
+                return result
+        if pending is not None:
+            # 已有相同请求在进行中，直接等待它的结果
+            return pending.result()
+
+        try:
+            entry = self._conditional_get(endpoint, params, validator)
+            with self._cache_lock:
+                self._store(key, entry, validator, generation)
+        except BaseException as e:
+            # 包括 KeyboardInterrupt 等，保证等待者不会永远阻塞
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(entry[1])
+            return entry[1]
+        finally:
+            with self._cache_lock:
+                self._inflight.pop(key, None)
+
+    def _conditional_get(self, endpoint: str, params: Dict, validator: Optional[tuple]) -> tuple:
+        """发送GET请求，有校验信息时附带条件请求头，服务端返回304时复用已缓存的数据"""
+        try:
+            response = self.client.get(
+                endpoint, params=params, headers=self._conditional_headers(validator)
+            )
+            if response.status_code == 304 and validator is not None:
+                return validator
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error("API请求失败: %s", e)
+            raise Exception(f"API请求失败: {e}")
+        return self._cache_entry(response)
+
+    @staticmethod
+    def _conditional_headers(validator: Optional[tuple]) -> Optional[Dict]:
+        """根据缓存的 ETag / Last-Modified 构建条件请求头"""
+        if validator is None:
+            return None
+        etag, _, last_modified = validator
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    @staticmethod
+    def _cache_entry(response: httpx.Response) -> tuple:
+        """把GET响应转换为 (etag, 数据, last_modified) 缓存条目"""
+        payload = orjson.loads(response.content) if response.content else {}
+        return (response.headers.get("ETag"), payload, response.headers.get("Last-Modified"))
+
+    def _store(self, key: tuple, entry: tuple, validator: Optional[tuple], generation: int) -> None:
+        """回填GET缓存（调用方需持有缓存锁）"""
+        # 请求期间发生过写操作时不回填，避免缓存旧数据
+        if generation != self._cache_generation:
+            return
+        if entry is validator:
+            self.cache_stats["revalidated"] += 1
+        self._get_cache[key] = entry[1]
+        if entry[0] or entry[2]:
+            self._validators[key] = entry
+
+    def _invalidate_cache(self) -> None:
+        """清空GET缓存"""
+        with self._cache_lock:
+            self._get_cache.clear()
+            self._validators.clear()
+            self._cache_generation += 1
+
     def _make_request_admin(self, method: str, endpoint: str, params: Dict = None, data: Dict = None) -> Dict:
         """发送请求到Memos Admin API"""
-        url = f"{self.base_url}{endpoint}"
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self.admin_headers,
-                params=params,
-                json=data
+            request = self.client.build_request(
+                method, endpoint, headers=self.admin_headers, params=params, json=data
             )
+            if not self.admin_api_key:
+                # 未配置管理员密钥时不携带普通用户的凭证
+                del request.headers["Authorization"]
+            response = self.client.send(request)
             response.raise_for_status()
-            if response.content:
-                return response.json()
-            return {}
-        except requests.RequestException as e:
-            logger.error(f"API请求失败: {e}")
+            return orjson.loads(response.content) if response.content else {}
+        except httpx.HTTPError as e:
+            logger.error("API请求失败: %s", e)
             raise Exception(f"API请求失败: {e}")
     def get_user_id(self) -> str:
         """
         Get the user ID of the authenticated user by checking auth status.
 
+        The result is cached for the lifetime of the client.
+
         Returns:
             str: The user ID of the authenticated user
 
         Raises:
             MemosException: If there is an error retrieving the user ID
         """
+        if self._user_id is not None:
+            return self._user_id
         try:
             # Use the auth/status endpoint to get current user info
-            response = requests.post(
-                f"{self.memos_url}/api/v1/auth/status", headers=self.headers
-            )
+            response = self.client.post("/api/v1/auth/status")
             response.raise_for_status()
 
             # Extract the user ID from the response
-            user_data = response.json()
+            user_data = orjson.loads(response.content)
             user_id = user_data.get("name")
 
             if not user_id:
                 raise MemosException("Could not retrieve user ID from auth status")
 
+            self._user_id = user_id
             return user_id
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             raise MemosException(f"Error getting user ID: {e}")
     # Memo相关方法
     def get_memos(self, params: Dict = None) -> List[Dict]:
         """获取备忘录列表"""
-        return self._make_request("GET", "/api/v1/memos", params=params)
+        return self._cached_get("/api/v1/memos", params=params)
+
+    def iter_memos(self, page_size: int = 200) -> Iterator[Dict]:
+        """分页遍历所有备忘录，内存占用只与单页大小相关"""
+        params = {"pageSize": page_size}
+        seen_tokens = set()
+        while True:
+            # 每个 pageToken 只会用到一次，分页请求不经过缓存
+            page = self._make_request("GET", "/api/v1/memos", params=params)
+            yield from page.get("memos", [])
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return
+            # 服务端重复返回已用过的 pageToken 时停止，避免无限循环
+            if page_token in seen_tokens:
+                logger.warning("分页令牌重复，停止遍历: %s", page_token)
+                return
+            seen_tokens.add(page_token)
+            params = {"pageSize": page_size, "pageToken": page_token}
     
     def get_memo(self, memo_id: str) -> Dict:
         """获取单个备忘录"""
-        return self._make_request("GET", f"/api/v1/memos/{memo_id}")
+        return self._cached_get(f"/api/v1/memos/{memo_id}")
     
     def create_memo(self, data: Dict) -> Dict:
         """创建新备忘录"""
-        return self._make_request("POST", "/api/v1/memos", data=data)
+        result = self._make_request("POST", "/api/v1/memos", data=data)
+        self._invalidate_cache()
+        return result
     
     def create_memo_comment(self, memo_id: str, data: Dict) -> Dict:
         """创建备忘录评论"""
-        return self._make_request("POST", f"/api/v1/memos/{memo_id}/comments", data=data)
+        result = self._make_request("POST", f"/api/v1/memos/{memo_id}/comments", data=data)
+        self._invalidate_cache()
+        return result
     
     def update_memo(self, memo_id: str, data: Dict) -> Dict:
         """更新备忘录"""
-        return self._make_request("PATCH", f"/api/v1/memos/{memo_id}", data=data)
+        result = self._make_request("PATCH", f"/api/v1/memos/{memo_id}", data=data)
+        self._invalidate_cache()
+        return result
     
     def delete_memo(self, memo_id: str) -> Dict:
         """删除备忘录"""
-        return self._make_request("DELETE", f"/api/v1/memos/{memo_id}")
+        result = self._make_request("DELETE", f"/api/v1/memos/{memo_id}")
+        self._invalidate_cache()
+        return result
     
     def search_memos(self, query: str = None, filter_expr: str = None) -> List[Dict]:
         """
@@ -164,12 +374,16 @@ class MemosClient:
             query: 搜索关键词
             filter_expr: CEL 表达式过滤器
         """
-        params = {}
-        if query:
-            params["filter"] = f"content.contains('{query}')"
+        return self._cached_get("/api/v1/memos", params=self._search_params(query, filter_expr))
+
+    @staticmethod
+    def _search_params(query: str = None, filter_expr: str = None) -> Optional[Dict]:
+        """构建搜索请求的查询参数，filter_expr 优先于 query"""
         if filter_expr:
-            params["filter"] = filter_expr
-        return self._make_request("GET", "/api/v1/memos", params=params)
+            return {"filter": filter_expr}
+        if query:
+            return {"filter": f"content.contains('{_cel_str(query)}')"}
+        return None
     
     def filter_memos(self, filter_expr: str) -> List[Dict]:
         """
@@ -188,61 +402,301 @@ class MemosClient:
     # 标签相关方法
     def get_tags(self) -> List[Dict]:
         """获取所有标签"""
-        return self._make_request("GET", "/api/v1/tag")
+        return self._cached_get("/api/v1/tag")
     
     def delete_memo_tag(self, memo_id: str, tag: str) -> Dict:
         """从备忘录中删除标签"""
-        # 首先获取备忘录
-        memo = self.get_memo(memo_id)
+        return self.remove_tags(memo_id, [tag])
+
+    def remove_tags(self, memo_id: str, tags: List[str]) -> Dict:
+        """从备忘录中一次删除多个标签，只需一次读取和一次更新"""
+        tags = _normalize_tags(tags)
+        if not tags:
+            raise ValueError("请提供要删除的标签")
+        # 首先获取备忘录；读-改-写必须绕过缓存，否则可能用旧内容覆盖其他地方的修改
+        memo = self._make_request("GET", f"/api/v1/memos/{memo_id}")
         
-        # 从内容中移除标签
+        # 从内容中移除标签，内容未变化时不发送更新
         content = memo.get("content", "")
-        tag_with_hash = f"#{tag}"
-        new_content = content.replace(tag_with_hash, "").strip()
+        new_content = self._strip_tags(content, tags)
+        if new_content == content.strip():
+            return memo
         
         # 更新备忘录
         return self.update_memo(memo_id, {"content": new_content})
+
+    @staticmethod
+    def _strip_tags(content: str, tags: List[str]) -> str:
+        """从内容中移除所有指定的标签，空标签会被忽略"""
+        tags = _normalize_tags(tags)
+        if not tags:
+            return content
+        return _tag_pattern(tuple(tags)).sub("", content).strip()
+
+    # 异步方法
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        """异步HTTP客户端，关闭后再次访问会重新创建"""
+        if self._aclient is None or self._aclient.is_closed:
+            self._aclient = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._base_headers,
+                timeout=self.timeout,
+                transport=httpx.AsyncHTTPTransport(http2=True, limits=self._limits, retries=3),
+            )
+        return self._aclient
+
+    async def aclose(self) -> None:
+        """关闭同步和异步HTTP客户端"""
+        self.client.close()
+        if self._aclient is not None:
+            aclient, self._aclient = self._aclient, None
+            await aclient.aclose()
+
+    async def _amake_request(self, method: str, endpoint: str, params: Dict = None, data: Dict = None) -> Dict:
+        """异步发送请求到Memos API"""
+        try:
+            response = await self.aclient.request(
+                method, endpoint, headers=self._headers_for(method), params=params, json=data
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content) if response.content else {}
+        except httpx.HTTPError as e:
+            logger.error("API请求失败: %s", e)
+            raise Exception(f"API请求失败: {e}")
+
+    async def _acached_get(self, endpoint: str, params: Dict = None) -> Dict:
+        """异步发送带TTL缓存的GET请求，并合并并发的相同请求"""
+        key = self._cache_key(endpoint, params)
+        with self._cache_lock:
+            try:
+                result = self._get_cache[key]
+            except KeyError:
+                task = self._ainflight.get(key)
+                if task is None:
+                    self.cache_stats["misses"] += 1
+                    task = asyncio.ensure_future(self._afetch(
+                        key, endpoint, params, self._validators.get(key), self._cache_generation
+                    ))
+                    self._ainflight[key] = task
+                else:
+                    self.cache_stats["coalesced"] += 1
+            else:
+                self.cache_stats["hits"] += 1
+                return result
+        # shield: 单个调用方被取消时不影响其他等待同一请求的调用方
+        return await asyncio.shield(task)
+
+    async def _afetch(
+        self, key: tuple, endpoint: str, params: Dict, validator: Optional[tuple], generation: int
+    ) -> Dict:
+        """执行一次被合并的异步GET请求并回填缓存"""
+        try:
+            entry = await self._aconditional_get(endpoint, params, validator)
+        finally:
+            with self._cache_lock:
+                self._ainflight.pop(key, None)
+        with self._cache_lock:
+            self._store(key, entry, validator, generation)
+        return entry[1]
+
+    async def _aconditional_get(self, endpoint: str, params: Dict, validator: Optional[tuple]) -> tuple:
+        """异步发送条件GET请求"""
+        try:
+            response = await self.aclient.get(
+                endpoint, params=params, headers=self._conditional_headers(validator)
+            )
+            if response.status_code == 304 and validator is not None:
+                return validator
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error("API请求失败: %s", e)
+            raise Exception(f"API请求失败: {e}")
+        return self._cache_entry(response)
+
+    async def aget_memos(self, params: Dict = None) -> List[Dict]:
+        """异步获取备忘录列表"""
+        return await self._acached_get("/api/v1/memos", params=params)
+
+    async def aiter_memos(self, page_size: int = 200) -> AsyncIterator[Dict]:
+        """异步分页遍历所有备忘录"""
+        params = {"pageSize": page_size}
+        seen_tokens = set()
+        while True:
+            # 每个 pageToken 只会用到一次，分页请求不经过缓存
+            page = await self._amake_request("GET", "/api/v1/memos", params=params)
+            for memo in page.get("memos", []):
+                yield memo
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return
+            if page_token in seen_tokens:
+                logger.warning("分页令牌重复，停止遍历: %s", page_token)
+                return
+            seen_tokens.add(page_token)
+            params = {"pageSize": page_size, "pageToken": page_token}
+
+    async def aget_memo(self, memo_id: str) -> Dict:
+        """异步获取单个备忘录"""
+        return await self._acached_get(f"/api/v1/memos/{memo_id}")
+
+    async def acreate_memo(self, data: Dict) -> Dict:
+        """异步创建新备忘录"""
+        result = await self._amake_request("POST", "/api/v1/memos", data=data)
+        self._invalidate_cache()
+        return result
+
+    async def acreate_memo_comment(self, memo_id: str, data: Dict) -> Dict:
+        """异步创建备忘录评论"""
+        result = await self._amake_request("POST", f"/api/v1/memos/{memo_id}/comments", data=data)
+        self._invalidate_cache()
+        return result
+
+    async def aupdate_memo(self, memo_id: str, data: Dict) -> Dict:
+        """异步更新备忘录"""
+        result = await self._amake_request("PATCH", f"/api/v1/memos/{memo_id}", data=data)
+        self._invalidate_cache()
+        return result
+
+    async def adelete_memo(self, memo_id: str) -> Dict:
+        """异步删除备忘录"""
+        result = await self._amake_request("DELETE", f"/api/v1/memos/{memo_id}")
+        self._invalidate_cache()
+        return result
+
+    async def asearch_memos(self, query: str = None, filter_expr: str = None) -> List[Dict]:
+        """异步搜索备忘录"""
+        return await self._acached_get("/api/v1/memos", params=self._search_params(query, filter_expr))
+
+    async def _amake_request_admin(self, method: str, endpoint: str, params: Dict = None, data: Dict = None) -> Dict:
+        """异步发送请求到Memos Admin API"""
+        try:
+            request = self.aclient.build_request(
+                method, endpoint, headers=self.admin_headers, params=params, json=data
+            )
+            if not self.admin_api_key:
+                # 未配置管理员密钥时不携带普通用户的凭证
+                del request.headers["Authorization"]
+            response = await self.aclient.send(request)
+            response.raise_for_status()
+            return orjson.loads(response.content) if response.content else {}
+        except httpx.HTTPError as e:
+            logger.error("API请求失败: %s", e)
+            raise Exception(f"API请求失败: {e}")
+
+    async def aget_users(self, params: Dict = None) -> List[Dict]:
+        """异步获取用户列表"""
+        response = await self._amake_request_admin("GET", "/api/v1/users", params=params)
+        return response.get("users", []) if isinstance(response, dict) else []
+
+    async def adelete_memo_tag(self, memo_id: str, tag: str) -> Dict:
+        """异步从备忘录中删除标签"""
+        return await self.aremove_tags(memo_id, [tag])
+
+    async def aremove_tags(self, memo_id: str, tags: List[str]) -> Dict:
+        """异步从备忘录中一次删除多个标签"""
+        tags = _normalize_tags(tags)
+        if not tags:
+            raise ValueError("请提供要删除的标签")
+        # 读-改-写必须绕过缓存
+        memo = await self._amake_request("GET", f"/api/v1/memos/{memo_id}")
+        content = memo.get("content", "")
+        new_content = self._strip_tags(content, tags)
+        if new_content == content.strip():
+            return memo
+        return await self.aupdate_memo(memo_id, {"content": new_content})
+
+    async def abulk_delete_tag(self, memo_ids: List[str], tag: str) -> List[Any]:
+        """
+        异步并发地从多个备忘录中删除同一个标签
+
+        Returns:
+            与 memo_ids 一一对应的列表，成功时为更新后的备忘录，失败时为对应的异常
+        """
+        semaphore = asyncio.Semaphore(_BULK_CONCURRENCY)
+
+        async def delete_one(memo_id: str) -> Dict:
+            async with semaphore:
+                return await self.adelete_memo_tag(memo_id, tag)
+
+        return await asyncio.gather(
+            *(delete_one(memo_id) for memo_id in memo_ids), return_exceptions=True
+        )
     
 
 
-# 创建Memos客户端实例
-memos_client = MemosClient(MEMOS_URL, MEMOS_API_KEY, MEMOS_ADMIN_API_KEY)
+# Memos客户端实例在首次使用时创建，导入模块时不需要配置
+@functools.lru_cache(maxsize=None)
+def get_client() -> MemosClient:
+    """获取共享的Memos客户端"""
+    return MemosClient(
+        MEMOS_URL,
+        MEMOS_API_KEY,
+        MEMOS_ADMIN_API_KEY,
+        connect_timeout=MEMOS_CONNECT_TIMEOUT,
+        read_timeout=MEMOS_READ_TIMEOUT,
+    )
+
+def _jdump(obj: Any) -> str:
+    """序列化为紧凑JSON，DEBUG日志级别下保留缩进便于排查"""
+    option = orjson.OPT_NON_STR_KEYS
+    if logger.isEnabledFor(logging.DEBUG):
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, option=option).decode()
 
 # 资源定义
 @mcp.resource("memos://recent")
-def get_recent_memos() -> str:
+async def get_recent_memos() -> str:
     """获取最近的备忘录"""
     try:
-        memos = memos_client.get_memos({"limit": 10})
-        return json.dumps(memos, ensure_ascii=False, indent=2)
+        memos = await get_client().aget_memos({"limit": 10})
+        return _jdump(memos)
     except Exception as e:
-        logger.error(f"获取最近备忘录失败: {e}")
+        logger.error("获取最近备忘录失败: %s", e)
         return f"获取最近备忘录失败: {e}"
 
 @mcp.resource("memos://all")
-def get_all_memos() -> str:
+async def get_all_memos() -> str:
     """获取所有备忘录"""
     try:
-        memos = memos_client.get_memos()
-        return json.dumps(memos, ensure_ascii=False, indent=2)
+        # 逐页序列化，不在内存中保留完整的备忘录列表
+        buf = io.StringIO()
+        async for memo in get_client().aiter_memos():
+            buf.write("," if buf.tell() else "[")
+            buf.write(_jdump(memo))
+        buf.write("]" if buf.tell() else "[]")
+        return buf.getvalue()
     except Exception as e:
-        logger.error(f"获取所有备忘录失败: {e}")
+        logger.error("获取所有备忘录失败: %s", e)
+        return f"获取所有备忘录失败: {e}"
+
+@mcp.resource("memos://all.ndjson", mime_type="application/x-ndjson")
+async def get_all_memos_ndjson() -> str:
+    """以NDJSON格式获取所有备忘录，每行一条"""
+    try:
+        buf = io.StringIO()
+        async for memo in get_client().aiter_memos():
+            buf.write(orjson.dumps(memo, option=orjson.OPT_NON_STR_KEYS).decode())
+            buf.write("\n")
+        return buf.getvalue()
+    except Exception as e:
+        logger.error("获取所有备忘录失败: %s", e)
         return f"获取所有备忘录失败: {e}"
 
 @mcp.resource("memos://users")
-def get_all_users() -> str:
+async def get_all_users() -> str:
     """获取所有用户"""
     try:
-        users = memos_client.get_users()
-        return json.dumps(users, ensure_ascii=False, indent=2)
+        users = await get_client().aget_users()
+        return _jdump(users)
     except Exception as e:
-        logger.error(f"获取所有用户失败: {e}")
+        logger.error("获取所有用户失败: %s", e)
         return f"获取所有用户失败: {e}"
 
 
 
 @mcp.resource("memos://memos/{memo_id}")
-def get_memo_by_id(memo_id: str) -> str:
+async def get_memo_by_id(memo_id: str) -> str:
     """
     获取指定ID的备忘录
     
@@ -253,16 +707,16 @@ def get_memo_by_id(memo_id: str) -> str:
         str: JSON 格式的备忘录数据
     """
     try:
-        memo = memos_client.get_memo(memo_id)
-        return json.dumps(memo, ensure_ascii=False, indent=2)
+        memo = await get_client().aget_memo(memo_id)
+        return _jdump(memo)
     except Exception as e:
-        logger.error(f"获取备忘录 {memo_id} 失败: {e}")
+        logger.error("获取备忘录 %s 失败: %s", memo_id, e)
         return f"获取备忘录 {memo_id} 失败: {e}"
 
 
 # 工具定义
 @mcp.tool()
-def search_memos(query: str = None, filter_expr: str = None) -> str:
+async def search_memos(query: str = None, filter_expr: str = None) -> str:
     """
     搜索备忘录
     
@@ -271,14 +725,14 @@ def search_memos(query: str = None, filter_expr: str = None) -> str:
         filter_expr: CEL 表达式过滤器，例如 "content.contains('关键词')"
     """
     try:
-        results = memos_client.search_memos(query, filter_expr)
-        return json.dumps(results, ensure_ascii=False, indent=2)
+        results = await get_client().asearch_memos(query, filter_expr)
+        return _jdump(results)
     except Exception as e:
-        logger.error(f"搜索备忘录失败: {e}")
+        logger.error("搜索备忘录失败: %s", e)
         return f"搜索备忘录失败: {e}"
 
 @mcp.tool()
-def filter_memos(filter_expr: str) -> str:
+async def filter_memos(filter_expr: str) -> str:
     """
     使用 CEL 表达式过滤备忘录
     
@@ -286,14 +740,14 @@ def filter_memos(filter_expr: str) -> str:
         filter_expr: CEL 表达式过滤器，例如 "content.contains('关键词')" 或 "createTime > timestamp('2023-01-01T00:00:00Z')"
     """
     try:
-        results = memos_client.filter_memos(filter_expr)
-        return json.dumps(results, ensure_ascii=False, indent=2)
+        results = await get_client().asearch_memos(filter_expr=filter_expr)
+        return _jdump(results)
     except Exception as e:
-        logger.error(f"过滤备忘录失败: {e}")
+        logger.error("过滤备忘录失败: %s", e)
         return f"过滤备忘录失败: {e}"
 
 @mcp.tool()
-def create_memo(content: str, visibility: str = "PRIVATE", tags: List[str] = None) -> str:
+async def create_memo(content: str, visibility: str = "PRIVATE", tags: List[str] = None) -> str:
     """
     创建新备忘录
     
@@ -311,32 +765,30 @@ def create_memo(content: str, visibility: str = "PRIVATE", tags: List[str] = Non
             else:
                 tags = []
         
-        # 将标签添加到内容中
-        content_with_tags = content+"\n"
-        for tag in tags:
-            if not tag.startswith("#"):
-                tag = f"#{tag}"
-            if tag not in content_with_tags:
-                content_with_tags += f" {tag}"
+        # 将内容中尚未出现的标签一次性追加到末尾
+        existing = set(_TAG_RE.findall(content))
+        normalized = dict.fromkeys("#" + name for name in (tag.lstrip("#") for tag in tags) if name)
+        to_add = [tag for tag in normalized if tag not in existing]
+        content_with_tags = content + "\n" + " ".join(to_add)
         
         data = {
             "content": content_with_tags,
             "visibility": visibility
         }
-        result = memos_client.create_memo(data)
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        result = await get_client().acreate_memo(data)
+        return _jdump(result)
     except Exception as e:
-        logger.error(f"创建备忘录失败: {e}")
+        logger.error("创建备忘录失败: %s", e)
         return f"创建备忘录失败: {e}"
 
 @mcp.tool()
-def get_all_users_tools() -> str:
+async def get_all_users_tools() -> str:
     """获取所有用户"""
     try:
-        users = memos_client.get_users()
-        return json.dumps(users, ensure_ascii=False, indent=2)
+        users = await get_client().aget_users()
+        return _jdump(users)
     except Exception as e:
-        logger.error(f"获取所有用户失败: {e}")
+        logger.error("获取所有用户失败: %s", e)
         return f"获取所有用户失败: {e}"
 
 
@@ -347,7 +799,7 @@ def get_all_users_tools() -> str:
         #       "content": {"type": "string", "description": "评论内容"},
         #       "visibility": {"type": "string", "description": "评论可见性设置 (PRIVATE, PROTECTED, PUBLIC)", "default": "PRIVATE"}}
         )
-def create_memo_comment(memo_id: str, content: str, visibility: str = "PRIVATE") -> str:
+async def create_memo_comment(memo_id: str, content: str, visibility: str = "PRIVATE") -> str:
     """
     创建新备忘录评论
     
@@ -378,14 +830,14 @@ def create_memo_comment(memo_id: str, content: str, visibility: str = "PRIVATE")
     "content": content,
     "visibility": visibility
   }
-        result = memos_client.create_memo_comment(memo_id, data)
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        result = await get_client().acreate_memo_comment(memo_id, data)
+        return _jdump(result)
     except Exception as e:
-        logger.error(f"创建备忘录评论失败: {e}")
+        logger.error("创建备忘录评论失败: %s", e)
         return f"创建备忘录评论失败: {e}"
 
 @mcp.tool()
-def update_memo(memo_id: str, content: str = None, visibility: str = None) -> str:
+async def update_memo(memo_id: str, content: str = None, visibility: str = None) -> str:
     """
     更新备忘录
     
@@ -404,14 +856,14 @@ def update_memo(memo_id: str, content: str = None, visibility: str = None) -> st
         if not data:
             return "错误: 请提供要更新的内容或可见性"
             
-        result = memos_client.update_memo(memo_id, data)
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        result = await get_client().aupdate_memo(memo_id, data)
+        return _jdump(result)
     except Exception as e:
-        logger.error(f"更新备忘录失败: {e}")
+        logger.error("更新备忘录失败: %s", e)
         return f"更新备忘录失败: {e}"
 
 @mcp.tool()
-def delete_memo(memo_id: str) -> str:
+async def delete_memo(memo_id: str) -> str:
     """
     删除备忘录
     
@@ -420,10 +872,10 @@ def delete_memo(memo_id: str) -> str:
     """
     try:
         memo_id=format_memos_id(memo_id)
-        memos_client.delete_memo(memo_id)
+        await get_client().adelete_memo(memo_id)
         return f"成功删除备忘录 {memo_id}"
     except Exception as e:
-        logger.error(f"删除备忘录失败: {e}")
+        logger.error("删除备忘录失败: %s", e)
         return f"删除备忘录失败: {e}"
 
 
@@ -439,12 +891,10 @@ def format_memos_id(memo_id: str) -> str:
     Returns:
         str: 格式化后的备忘录ID
     """
-    if memo_id.startswith("memos/"):
-        memo_id = memo_id[6:]
-    return memo_id
+    return memo_id[_MEMO_PREFIX_LEN:] if memo_id.startswith(_MEMO_PREFIX) else memo_id
 
 @mcp.tool()
-def delete_memo_tag(memo_id: str, tag: str) -> str:
+async def delete_memo_tag(memo_id: str, tag: str) -> str:
     """
     从备忘录中删除标签
     
@@ -455,19 +905,70 @@ def delete_memo_tag(memo_id: str, tag: str) -> str:
     try:
         if not memo_id:
             return "请提供备忘录ID"
+        if not _normalize_tags([tag or ""]):
+            return "请提供要删除的标签"
+        memo_id = format_memos_id(memo_id)
+        result = await get_client().adelete_memo_tag(memo_id, tag)
+        return _jdump(result)
+    except Exception as e:
+        logger.error("删除标签失败: %s", e)
+        return f"删除标签失败: {e}"
+
+@mcp.tool()
+async def delete_memo_tags(memo_id: str, tags: List[str]) -> str:
+    """
+    从备忘录中一次删除多个标签
+    
+    Args:
+        memo_id: 备忘录ID 格式是{G3o72r9oijTWFxy9ueWzW7} 而不是{memos/G3o72r9oijTWFxy9ueWzW7}
+        tags: 要删除的标签名称列表(不包含#符号)
+    """
+    try:
+        if not memo_id:
+            return "请提供备忘录ID"
+        if not _normalize_tags(tags or []):
+            return "请提供要删除的标签"
         memo_id = format_memos_id(memo_id)
-        result = memos_client.delete_memo_tag(memo_id, tag)
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        result = await get_client().aremove_tags(memo_id, tags)
+        return _jdump(result)
     except Exception as e:
-        logger.error(f"删除标签失败: {e}")
+        logger.error("删除标签失败: %s", e)
         return f"删除标签失败: {e}"
 
+@mcp.tool()
+async def bulk_delete_memo_tag(memo_ids: List[str], tag: str) -> str:
+    """
+    从多个备忘录中并发删除同一个标签，逐条返回每个备忘录的结果或错误
+    
+    Args:
+        memo_ids: 备忘录ID列表 格式是{G3o72r9oijTWFxy9ueWzW7} 而不是{memos/G3o72r9oijTWFxy9ueWzW7}
+        tag: 要删除的标签名称(不包含#符号)
+    """
+    try:
+        if not memo_ids:
+            return "请提供备忘录ID"
+        # 空标签会改写所有备忘录的标题，在并发请求前拒绝
+        if not _normalize_tags([tag or ""]):
+            return "请提供要删除的标签"
+        memo_ids = [format_memos_id(memo_id) for memo_id in memo_ids]
+        results = await get_client().abulk_delete_tag(memo_ids, tag)
+        # 逐条返回结果，部分失败时调用方仍能知道哪些备忘录已被修改
+        report = []
+        for memo_id, result in zip(memo_ids, results):
+            if isinstance(result, BaseException):
+                logger.error("删除备忘录 %s 的标签失败: %s", memo_id, result)
+                report.append({"memo_id": memo_id, "error": str(result)})
+            else:
+                report.append({"memo_id": memo_id, "memo": result})
+        return _jdump(report)
+    except Exception as e:
+        logger.error("批量删除标签失败: %s", e)
+        return f"批量删除标签失败: {e}"
+
 
 
-@mcp.prompt("weekly-summary")
-def weekly_summary_prompt() -> str:
-    """每周总结提示，帮助用户总结一周的备忘录"""
-    return """
+# 提示模板内容，导入时构建一次
+_WEEKLY_SUMMARY = textwrap.dedent("""
     # 每周备忘录总结
 
     请帮我总结过去一周的备忘录，并按以下方式组织：
@@ -478,12 +979,9 @@ def weekly_summary_prompt() -> str:
     4. 对下周的建议和改进
 
     请使用搜索工具查找过去一周的备忘录，并提供全面的总结和见解。
-    """
+    """).strip()
 
-@mcp.prompt("knowledge-extraction")
-def knowledge_extraction_prompt() -> str:
-    """知识提取提示，帮助用户从备忘录中提取知识"""
-    return """
+_KNOWLEDGE_EXTRACTION = textwrap.dedent("""
     # 知识提取助手
 
     请帮我从我的备忘录中提取有价值的知识和见解：
@@ -494,14 +992,9 @@ def knowledge_extraction_prompt() -> str:
     4. 组织成易于理解和引用的格式
 
     请使用搜索工具查找相关备忘录，并帮助我构建一个知识库。
-    """
-
+    """).strip()
 
-
-@mcp.prompt("content-improvement")
-def content_improvement_prompt() -> str:
-    """内容改进提示，帮助用户改进备忘录内容"""
-    return """
+_CONTENT_IMPROVEMENT = textwrap.dedent("""
     # 备忘录内容改进助手
 
     请帮我改进以下备忘录的内容质量：
@@ -512,20 +1005,52 @@ def content_improvement_prompt() -> str:
     4. 确保一致的格式和风格
 
     请分析备忘录内容，并提供具体的改进建议。
-    """
+    """).strip()
+
+
+@mcp.prompt("weekly-summary")
+def weekly_summary_prompt() -> str:
+    """每周总结提示，帮助用户总结一周的备忘录"""
+    return _WEEKLY_SUMMARY
+
+@mcp.prompt("knowledge-extraction")
+def knowledge_extraction_prompt() -> str:
+    """知识提取提示，帮助用户从备忘录中提取知识"""
+    return _KNOWLEDGE_EXTRACTION
+
+
+
+@mcp.prompt("content-improvement")
+def content_improvement_prompt() -> str:
+    """内容改进提示，帮助用户改进备忘录内容"""
+    return _CONTENT_IMPROVEMENT
+async def _serve(run: Callable[[], Awaitable[None]]) -> None:
+    """运行MCP服务，进程退出前在同一个事件循环中关闭共享的HTTP客户端"""
+    try:
+        await run()
+    finally:
+        # 客户端从未创建时无需关闭，也避免在这里触发创建
+        if get_client.cache_info().currsize:
+            await get_client().aclose()
+
 def start_server():
+    # 配置日志，只在启动服务时进行，导入模块不会修改全局日志配置
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # httpx 默认在INFO级别记录每个请求，这里只保留警告
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    _require_config()
     print(f"启动Memos MCP服务器，连接到: {MEMOS_URL}")
     print(f"使用传输方式: {MCP_TRANSPORT}")
 
     if MCP_TRANSPORT == "stdio":
         print("运行于 stdio 模式，适合 Claude Code 等本地 MCP 客户端。")
-        mcp.run(transport="stdio")
+        anyio.run(_serve, mcp.run_stdio_async)
         return
 
     if MCP_TRANSPORT == "streamable-http":
         print("使用Ctrl+C停止服务器")
         print(f"HTTP 地址: http://127.0.0.1:{MCP_PORT}{MCP_STREAMABLE_HTTP_PATH}")
-        mcp.run(transport="streamable-http")
+        anyio.run(_serve, mcp.run_streamable_http_async)
         return
 
     raise ValueError(
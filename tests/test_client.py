@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+import orjson
+import pytest
+
+from memos_cmp import server
+from memos_cmp.server import MemosClient
+
+BASE_URL = "http://memos.test"
+
+
+def make_client(handler):
+    """构建使用 MockTransport 的客户端，同步和异步请求都交给 handler 处理"""
+    client = MemosClient(BASE_URL, "test-key")
+    client.client = httpx.Client(
+        base_url=BASE_URL, headers=client._base_headers, transport=httpx.MockTransport(handler)
+    )
+    client._aclient = httpx.AsyncClient(
+        base_url=BASE_URL, headers=client._base_headers, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+class Recorder:
+    """记录收到的请求，并按顺序返回预设的响应"""
+
+    def __init__(self, *responses, delay=0.0):
+        self.requests = []
+        self.responses = list(responses)
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        with self._lock:
+            self.requests.append(request)
+            response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if self.delay:
+            time.sleep(self.delay)
+        return response() if callable(response) else response
+
+
+def test_get_is_cached_until_write():
+    recorder = Recorder(httpx.Response(200, json={"memos": [1]}))
+    client = make_client(recorder)
+
+    assert client.get_memos({"pageSize": 1}) == {"memos": [1]}
+    assert client.get_memos({"pageSize": 1}) == {"memos": [1]}
+    assert len(recorder.requests) == 1
+    assert client.cache_stats["hits"] == 1
+    assert client.cache_stats["misses"] == 1
+
+    client.update_memo("a", {"content": "x"})
+    client.get_memos({"pageSize": 1})
+    assert [r.method for r in recorder.requests] == ["GET", "PATCH", "GET"]
+
+
+def test_write_during_fetch_is_not_cached():
+    client = None
+
+    def handler(request):
+        # 模拟GET请求进行期间发生了写操作
+        client._invalidate_cache()
+        return httpx.Response(200, json={"memos": ["stale"]})
+
+    client = make_client(handler)
+    assert client.get_memos() == {"memos": ["stale"]}
+    assert len(client._get_cache) == 0
+    assert len(client._validators) == 0
+
+
+def test_concurrent_gets_are_coalesced():
+    recorder = Recorder(httpx.Response(200, json={"memos": [1]}), delay=0.2)
+    client = make_client(recorder)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(client.get_memos())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{"memos": [1]}] * 5
+    assert len(recorder.requests) == 1
+    assert client.cache_stats["coalesced"] == 4
+    assert client._inflight == {}
+
+
+def test_coalesced_errors_reach_every_caller():
+    recorder = Recorder(httpx.Response(500), delay=0.2)
+    client = make_client(recorder)
+    errors = []
+
+    def call():
+        try:
+            client.get_memos()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert len(recorder.requests) == 1
+    assert client._inflight == {}
+    assert len(client._get_cache) == 0
+
+
+def test_base_exception_does_not_leave_inflight_entry():
+    def handler(request):
+        raise KeyboardInterrupt
+
+    client = make_client(handler)
+    with pytest.raises(KeyboardInterrupt):
+        client.get_memos()
+    assert client._inflight == {}
+
+
+def test_expired_entry_is_revalidated_with_etag():
+    recorder = Recorder(
+        httpx.Response(200, json={"memos": [1]}, headers={"ETag": '"v1"'}),
+        httpx.Response(304, headers={"ETag": '"v1"'}),
+    )
+    client = make_client(recorder)
+
+    first = client.get_memos()
+    client._get_cache.clear()  # 模拟TTL过期
+    second = client.get_memos()
+
+    assert second == first
+    assert "If-None-Match" not in recorder.requests[0].headers
+    assert recorder.requests[1].headers["If-None-Match"] == '"v1"'
+    assert client.cache_stats["revalidated"] == 1
+    # 304 之后数据重新进入TTL缓存
+    client.get_memos()
+    assert len(recorder.requests) == 2
+
+
+def test_remove_tags_reads_uncached():
+    memo = {"name": "memos/a", "content": "hello #tag #keep"}
+    recorder = Recorder(
+        httpx.Response(200, json=memo),
+        httpx.Response(200, json={"name": "memos/a", "content": "edited #tag #keep"}),
+        lambda: httpx.Response(200, json={"name": "memos/a"}),
+    )
+    client = make_client(recorder)
+
+    client.get_memo("a")
+    client.delete_memo_tag("a", "tag")
+
+    methods = [r.method for r in recorder.requests]
+    assert methods == ["GET", "GET", "PATCH"]
+    assert b"edited #keep" in recorder.requests[2].content
+
+
+def test_async_get_cache_and_coalescing():
+    recorder = Recorder(httpx.Response(200, json={"memos": [1]}, headers={"ETag": '"v1"'}))
+    client = make_client(recorder)
+
+    async def run():
+        results = await asyncio.gather(*(client.aget_memos() for _ in range(4)))
+        assert results == [{"memos": [1]}] * 4
+        assert await client.aget_memos() == {"memos": [1]}
+
+    asyncio.run(run())
+    assert len(recorder.requests) == 1
+    assert client.cache_stats["coalesced"] == 3
+    assert client.cache_stats["hits"] == 1
+    assert client._ainflight == {}
+
+
+def test_async_revalidation_and_errors():
+    recorder = Recorder(
+        httpx.Response(200, json={"memos": [1]}, headers={"ETag": '"v1"'}),
+        httpx.Response(304),
+        httpx.Response(500),
+    )
+    client = make_client(recorder)
+
+    async def run():
+        first = await client.aget_memos()
+        client._get_cache.clear()
+        assert await client.aget_memos() == first
+        assert client.cache_stats["revalidated"] == 1
+        client._invalidate_cache()
+        with pytest.raises(Exception):
+            await client.aget_memos()
+
+    asyncio.run(run())
+    assert recorder.requests[1].headers["If-None-Match"] == '"v1"'
+    assert "If-None-Match" not in recorder.requests[2].headers
+    assert client._ainflight == {}
+
+
+def test_accept_encoding_is_left_to_httpx():
+    recorder = Recorder(httpx.Response(200, json={"memos": []}))
+    client = make_client(recorder)
+    client.get_memos()
+    encodings = recorder.requests[0].headers["Accept-Encoding"]
+    assert "deflate" in encodings
+    assert encodings == httpx.Client().headers["Accept-Encoding"]
+
+
+@pytest.mark.parametrize("tags", [[""], ["#"], ["", "##"]])
+def test_remove_tags_rejects_empty_tags(tags):
+    recorder = Recorder(httpx.Response(200, json={"name": "memos/a", "content": "# Heading\nbody"}))
+    client = make_client(recorder)
+
+    with pytest.raises(ValueError):
+        client.remove_tags("a", tags)
+    with pytest.raises(ValueError):
+        asyncio.run(client.aremove_tags("a", tags))
+    assert recorder.requests == []
+
+
+def test_remove_tags_skips_patch_when_unchanged():
+    memo = {"name": "memos/a", "content": "# Heading\nbody #keep"}
+    recorder = Recorder(lambda: httpx.Response(200, json=memo))
+    client = make_client(recorder)
+
+    assert client.remove_tags("a", ["missing"]) == memo
+    assert asyncio.run(client.aremove_tags("a", ["missing"])) == memo
+    assert [r.method for r in recorder.requests] == ["GET", "GET"]
+
+
+def test_bulk_delete_reports_each_memo(monkeypatch):
+    def handler(request):
+        if request.url.path.endswith("/missing"):
+            return httpx.Response(404)
+        if request.method == "PATCH":
+            return httpx.Response(200, json={"name": "memos/ok", **orjson.loads(request.content)})
+        return httpx.Response(200, json={"name": "memos/ok", "content": "body #t"})
+
+    client = make_client(handler)
+    monkeypatch.setattr(server, "get_client", lambda: client)
+
+    report = orjson.loads(asyncio.run(server.bulk_delete_memo_tag(["ok", "missing"], "t")))
+    assert report[0] == {"memo_id": "ok", "memo": {"name": "memos/ok", "content": "body"}}
+    assert report[1]["memo_id"] == "missing"
+    assert "404" in report[1]["error"]
+
+
+@pytest.mark.parametrize("tag", ["", "#"])
+def test_bulk_delete_rejects_empty_tag(monkeypatch, tag):
+    monkeypatch.setattr(server, "get_client", lambda: pytest.fail("不应请求API"))
+    assert asyncio.run(server.bulk_delete_memo_tag(["a", "b"], tag)) == "请提供要删除的标签"
+
+
+def test_async_users_and_comments(monkeypatch):
+    def handler(request):
+        if request.url.path == "/api/v1/users":
+            assert "Authorization" not in request.headers
+            return httpx.Response(200, json={"users": [{"name": "users/1"}]})
+        if request.method == "POST":
+            return httpx.Response(200, json={"name": "memos/c"})
+        return httpx.Response(200, json={"memos": []})
+
+    client = make_client(handler)
+    monkeypatch.setattr(server, "get_client", lambda: client)
+
+    assert orjson.loads(asyncio.run(server.get_all_users_tools())) == [{"name": "users/1"}]
+    client.get_memos()
+    assert orjson.loads(asyncio.run(server.create_memo_comment("a", "hi"))) == {"name": "memos/c"}
+    assert len(client._get_cache) == 0
+    assert orjson.loads(asyncio.run(server.filter_memos("pinned"))) == {"memos": []}
+
+
+def test_import_leaves_logging_untouched():
+    assert logging.getLogger("httpx").level == logging.NOTSET
+
+
+def test_iter_memos_stops_on_repeated_page_token():
+    def handler(request):
+        token = request.url.params.get("pageToken")
+        if token is None:
+            return httpx.Response(200, json={"memos": [1], "nextPageToken": "p2"})
+        # 第二页开始服务端一直返回同一个令牌
+        return httpx.Response(200, json={"memos": [2], "nextPageToken": "p2"})
+
+    client = make_client(handler)
+
+    async def collect():
+        return [memo async for memo in client.aiter_memos()]
+
+    assert list(client.iter_memos()) == [1, 2]
+    assert asyncio.run(collect()) == [1, 2]
@@ -0,0 +1,24 @@
+import pytest
+
+from memos_cmp.server import MemosClient, _cel_str
+
+
+@pytest.mark.parametrize(
+    "raw, escaped",
+    [
+        ("plain 中文", "plain 中文"),
+        ("it's", "it\\'s"),
+        ("back\\slash", "back\\\\slash"),
+        ("two\nlines\r\n", "two\\nlines\\r\\n"),
+        ("tab\there", "tab\\there"),
+        ("nul\x00del\x7f", "nul\\x00del\\x7f"),
+    ],
+)
+def test_cel_str_escapes(raw, escaped):
+    assert _cel_str(raw) == escaped
+
+
+def test_search_query_stays_on_one_line():
+    params = MemosClient._search_params("a')\n|| true || ('")
+    assert params == {"filter": "content.contains('a\\')\\n|| true || (\\'')"}
+    assert "\n" not in params["filter"]
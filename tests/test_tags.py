@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from memos_cmp import server
+from memos_cmp.server import MemosClient
+
+
+@pytest.mark.parametrize(
+    "content, tags, expected",
+    [
+        ("note #work/project", ["work/project"], "note"),
+        ("note #foo-bar done", ["foo-bar"], "note done"),
+        ("note #c++", ["c++"], "note"),
+        ("#tagline #tag", ["tag"], "#tagline"),
+        ("#work/project #work", ["work"], "#work/project"),
+        ("#foo-bar\nline two", ["#foo-bar"], "line two"),
+        ("done #todo.", ["todo"], "done ."),
+        ("done #todo, ok", ["todo"], "done , ok"),
+        ("see (#todo) here", ["todo"], "see () here"),
+        ("完成 #todo，明天继续", ["todo"], "完成 ，明天继续"),
+        ("#todo.list", ["todo"], ".list"),
+    ],
+)
+def test_strip_tags(content, tags, expected):
+    assert MemosClient._strip_tags(content, tags) == expected
+
+
+class _FakeClient:
+    def __init__(self):
+        self.created = []
+
+    async def acreate_memo(self, data):
+        self.created.append(data)
+        return data
+
+
+@pytest.mark.parametrize(
+    "content, tags, expected",
+    [
+        ("plan #work/project", ["work/project"], "plan #work/project\n"),
+        ("plan #work/project", ["work"], "plan #work/project\n#work"),
+        ("todo #c++", ["#c++", "c++", "next"], "todo #c++\n#next"),
+        ("note #mcp.", ["mcp"], "note #mcp.\n"),
+        ("see (#mcp), #ai。", ["mcp", "ai", "#"], "see (#mcp), #ai。\n"),
+    ],
+)
+def test_create_memo_skips_existing_tags(monkeypatch, content, tags, expected):
+    fake = _FakeClient()
+    monkeypatch.setattr(server, "get_client", lambda: fake)
+    asyncio.run(server.create_memo(content, tags=tags))
+    assert fake.created[0]["content"] == expected
+
+
+def test_strip_tags_ignores_empty_tags():
+    assert MemosClient._strip_tags("# Heading\nbody", ["#"]) == "# Heading\nbody"
+    assert MemosClient._strip_tags("# Heading\nbody #x", ["", "x"]) == "# Heading\nbody"
+
+
+def test_delete_memo_tags_rejects_empty_tags(monkeypatch):
+    monkeypatch.setattr(server, "get_client", lambda: pytest.fail("不应请求API"))
+    assert asyncio.run(server.delete_memo_tags("a", ["", "#"])) == "请提供要删除的标签"
+    assert asyncio.run(server.delete_memo_tag("a", "#")) == "请提供要删除的标签"